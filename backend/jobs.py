@@ -0,0 +1,186 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    __slots__ = ("key", "func", "args", "attempts", "enqueued_at")
+
+    def __init__(self, key: str, func: Callable[..., Awaitable], args: tuple, enqueued_at: float):
+        self.key = key
+        self.func = func
+        self.args = args
+        self.attempts = 0
+        self.enqueued_at = enqueued_at
+
+
+class JobQueue:
+    """Fila de jobs em processo, com workers asyncio.
+
+    Cada chave tem no máximo um job ativo (na fila, rodando ou aguardando
+    retry). Um job novo para uma chave que ainda está na fila é deduplicado;
+    se a chave está rodando ou aguardando retry, ele é adiado e roda quando o
+    ativo terminar, substituindo um retry pendente. Jobs que falham são
+    tentados de novo com backoff exponencial até ``max_retries``.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_retries: int = 3,
+        retry_base_delay: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if workers < 1:
+            raise ValueError(f"workers deve ser >= 1 (recebido {workers})")
+        if max_retries < 0 or retry_base_delay < 0:
+            raise ValueError("max_retries e retry_base_delay não podem ser negativos")
+        self.workers = workers
+        self.max_retries = max_retries
+        self.retry_base_delay = retry_base_delay
+        self.clock = clock
+        self._queue: Optional[asyncio.Queue] = None
+        # chave -> job ativo
+        self._active: Dict[str, Job] = {}
+        # chaves cujo job ativo está aguardando na fila
+        self._queued: set = set()
+        # chave -> job mais novo, que roda depois do ativo
+        self._deferred: Dict[str, Job] = {}
+        self._retrying: set = set()
+        self._tasks: List[asyncio.Task] = []
+        self._running = 0
+        self._runs = 0
+        self.metrics = {
+            "enqueued": 0,
+            "deduplicated": 0,
+            "deferred": 0,
+            "superseded": 0,
+            "succeeded": 0,
+            "failed": 0,
+            "retried": 0,
+            "wait_seconds_total": 0.0,
+            "run_seconds_total": 0.0,
+        }
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 30.0):
+        """Espera a fila esvaziar (até ``timeout``) e encerra os workers."""
+        if self._queue is None:
+            return
+        try:
+            await asyncio.wait_for(self._drained(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Fila de jobs encerrada com %d jobs pendentes", len(self._active))
+        for task in self._tasks + list(self._retrying):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._retrying, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+        self._active.clear()
+        self._queued.clear()
+        self._deferred.clear()
+
+    async def _drained(self):
+        while True:
+            await self._queue.join()
+            if not self._retrying:
+                return
+            await asyncio.gather(*list(self._retrying), return_exceptions=True)
+
+    def enqueue(self, key: str, func: Callable[..., Awaitable], *args) -> bool:
+        """Agenda ``func(*args)``. Retorna False se já houver um job igual aguardando."""
+        if self._queue is None:
+            logger.warning("Fila de jobs parada, job %s descartado", key)
+            return False
+        if key in self._queued or key in self._deferred:
+            self.metrics["deduplicated"] += 1
+            return False
+        job = Job(key, func, args, self.clock())
+        if key in self._active:
+            # Rodando ou aguardando retry: roda de novo quando o atual terminar
+            self._deferred[key] = job
+            self.metrics["deferred"] += 1
+        else:
+            self._put(job)
+        self.metrics["enqueued"] += 1
+        return True
+
+    def _put(self, job: Job):
+        self._queue.put_nowait(job)
+        self._active[job.key] = job
+        self._queued.add(job.key)
+
+    def _finish(self, key: str):
+        self._active.pop(key, None)
+        deferred = self._deferred.pop(key, None)
+        if deferred is not None:
+            self._put(deferred)
+
+    def _supersede(self, job: Job):
+        # Um job mais novo para a mesma chave vai rodar; o retry seria obsoleto
+        self.metrics["superseded"] += 1
+        self._finish(job.key)
+
+    def retry_delay(self, attempts: int) -> float:
+        """Backoff exponencial: base, 2*base, 4*base..."""
+        return self.retry_base_delay * 2 ** (attempts - 1)
+
+    async def _retry_later(self, job: Job, delay: float):
+        await asyncio.sleep(delay)
+        if job.key in self._deferred:
+            self._supersede(job)
+            return
+        job.enqueued_at = self.clock()
+        self._queue.put_nowait(job)
+        self._queued.add(job.key)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            self._queued.discard(job.key)
+            started = self.clock()
+            self._running += 1
+            self._runs += 1
+            self.metrics["wait_seconds_total"] += started - job.enqueued_at
+            try:
+                await job.func(*job.args)
+                self.metrics["succeeded"] += 1
+                self._finish(job.key)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                job.attempts += 1
+                if job.attempts > self.max_retries:
+                    self.metrics["failed"] += 1
+                    logger.exception("Job %s falhou após %d tentativas", job.key, job.attempts)
+                    self._finish(job.key)
+                elif job.key in self._deferred:
+                    self._supersede(job)
+                else:
+                    self.metrics["retried"] += 1
+                    delay = self.retry_delay(job.attempts)
+                    logger.warning("Job %s falhou, nova tentativa em %.1fs", job.key, delay)
+                    task = asyncio.create_task(self._retry_later(job, delay))
+                    self._retrying.add(task)
+                    task.add_done_callback(self._retrying.discard)
+            finally:
+                self._running -= 1
+                self.metrics["run_seconds_total"] += self.clock() - started
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        return {
+            "depth": self._queue.qsize() if self._queue else 0,
+            "running": self._running,
+            "retrying": len(self._retrying),
+            "workers": self.workers,
+            **{k: v for k, v in self.metrics.items() if not k.endswith("_total")},
+            "avg_wait_seconds": self.metrics["wait_seconds_total"] / self._runs if self._runs else 0.0,
+            "avg_run_seconds": self.metrics["run_seconds_total"] / self._runs if self._runs else 0.0,
+        }
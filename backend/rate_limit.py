@@ -0,0 +1,145 @@
+import math
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone, timedelta
+from typing import Callable
+
+from pymongo import ReturnDocument
+
+BACKENDS = ("memory", "mongo")
+
+
+def validate_bucket(capacity: float, refill_per_sec: float):
+    if capacity < 1:
+        raise ValueError(f"capacity deve ser >= 1 (recebido {capacity})")
+    if refill_per_sec <= 0:
+        raise ValueError(f"refill_per_sec deve ser > 0 (recebido {refill_per_sec})")
+
+
+class TokenBucketLimiter:
+    """Token bucket por chave, em memória, com número máximo de chaves (LRU)."""
+
+    def __init__(
+        self,
+        capacity: float,
+        refill_per_sec: float,
+        max_keys: int = 10000,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        validate_bucket(capacity, refill_per_sec)
+        if max_keys < 1:
+            raise ValueError(f"max_keys deve ser >= 1 (recebido {max_keys})")
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.max_keys = max_keys
+        self.clock = clock
+        # chave -> (tokens, último timestamp do clock)
+        self._buckets: "OrderedDict[str, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._buckets
+
+    def _tokens(self, key: str, now: float) -> float:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            return self.capacity
+        tokens, last = bucket
+        return min(self.capacity, tokens + (now - last) * self.refill_per_sec)
+
+    async def acquire(self, key: str) -> float:
+        """Consome um token. Retorna 0 se permitido, senão os segundos até o próximo token."""
+        now = self.clock()
+        tokens = self._tokens(key, now)
+        self._buckets.pop(key, None)
+
+        retry_after = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / self.refill_per_sec
+
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_keys:
+            self._buckets.popitem(last=False)
+        return retry_after
+
+    async def refund(self, key: str):
+        """Devolve um token consumido por ``acquire``."""
+        if key not in self._buckets:
+            return
+        now = self.clock()
+        self._buckets[key] = (min(self.capacity, self._tokens(key, now) + 1), now)
+
+
+class MongoTokenBucketLimiter:
+    """Token bucket compartilhado entre workers, guardado no MongoDB.
+
+    O refill e o consumo acontecem em um único update atômico (pipeline),
+    e um índice TTL em ``expires_at`` remove chaves inativas.
+    """
+
+    def __init__(
+        self,
+        collection,
+        capacity: float,
+        refill_per_sec: float,
+        clock: Callable[[], float] = time.time,
+    ):
+        validate_bucket(capacity, refill_per_sec)
+        self.collection = collection
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        # Relógio de parede: o timestamp é compartilhado entre processos
+        self.clock = clock
+        # Tempo para um bucket vazio voltar a ficar cheio
+        self.idle_ttl = math.ceil(capacity / refill_per_sec)
+
+    async def acquire(self, key: str) -> float:
+        now = self.clock()
+        refilled = {"$min": [
+            self.capacity,
+            {"$add": [
+                {"$ifNull": ["$tokens", self.capacity]},
+                {"$multiply": [
+                    {"$subtract": [now, {"$ifNull": ["$ts", now]}]},
+                    self.refill_per_sec,
+                ]},
+            ]},
+        ]}
+        doc = await self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "ts": now}},
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [
+                        {"$gte": ["$tokens", 1]},
+                        {"$subtract": ["$tokens", 1]},
+                        "$tokens",
+                    ]},
+                    "expires_at": datetime.now(timezone.utc) + timedelta(seconds=self.idle_ttl),
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if doc["allowed"]:
+            return 0.0
+        return (1 - doc["tokens"]) / self.refill_per_sec
+
+    async def refund(self, key: str):
+        await self.collection.update_one(
+            {"_id": key},
+            [{"$set": {"tokens": {"$min": [self.capacity, {"$add": ["$tokens", 1]}]}}}],
+        )
+
+
+def create_limiter(backend: str, capacity: float, refill_per_sec: float, max_keys: int = 10000, collection=None):
+    if backend not in BACKENDS:
+        raise ValueError(f"RATE_LIMIT_BACKEND inválido: {backend!r} (use um de {', '.join(BACKENDS)})")
+    if backend == "mongo":
+        return MongoTokenBucketLimiter(collection, capacity, refill_per_sec)
+    return TokenBucketLimiter(capacity, refill_per_sec, max_keys)
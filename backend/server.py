@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, Request, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
@@ -7,13 +7,16 @@ import os
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional
 import uuid
 from datetime import datetime, timezone, timedelta
 import jwt
 from passlib.context import CryptContext
 import base64
+import rate_limit
+import jobs
 import re
+import math
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -35,6 +38,23 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'sua-chave-secreta-super-segura-aqui-12345')
 ALGORITHM = "HS256"
 
+# Rate limiting (login/registro)
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+AUTH_IP_CAPACITY = float(os.environ.get('AUTH_IP_CAPACITY', '20'))
+AUTH_IP_REFILL_PER_SEC = float(os.environ.get('AUTH_IP_REFILL_PER_SEC', '0.2'))
+AUTH_EMAIL_CAPACITY = float(os.environ.get('AUTH_EMAIL_CAPACITY', '5'))
+AUTH_EMAIL_REFILL_PER_SEC = float(os.environ.get('AUTH_EMAIL_REFILL_PER_SEC', '0.05'))
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', '10000'))
+# Quantidade de proxies confiáveis na frente da app (ex.: 1 no Render).
+# Com 0, o IP do cliente é o peer TCP e X-Forwarded-For é ignorado.
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', '0'))
+
+# Background jobs (pós-publicação)
+JOB_QUEUE_WORKERS = int(os.environ.get('JOB_QUEUE_WORKERS', '4'))
+JOB_MAX_RETRIES = int(os.environ.get('JOB_MAX_RETRIES', '3'))
+JOB_RETRY_BASE_DELAY = float(os.environ.get('JOB_RETRY_BASE_DELAY', '1'))
+JOB_SHUTDOWN_TIMEOUT = float(os.environ.get('JOB_SHUTDOWN_TIMEOUT', '30'))
+
 # Models
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -135,9 +155,70 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Token inválido")
 
+# Rate limiting
+def create_limiter(name: str, capacity: float, refill_per_sec: float):
+    return rate_limit.create_limiter(
+        RATE_LIMIT_BACKEND, capacity, refill_per_sec,
+        max_keys=RATE_LIMIT_MAX_KEYS, collection=db[f"rate_limit_{name}"],
+    )
+
+auth_ip_limiter = create_limiter("auth_ip", AUTH_IP_CAPACITY, AUTH_IP_REFILL_PER_SEC)
+auth_email_limiter = create_limiter("auth_email", AUTH_EMAIL_CAPACITY, AUTH_EMAIL_REFILL_PER_SEC)
+
+def get_client_ip(request: Request) -> str:
+    """IP do cliente, lido do X-Forwarded-For quando há proxies confiáveis.
+
+    Cada proxy acrescenta o endereço de quem o chamou no fim do header, então
+    com N proxies confiáveis o cliente é a N-ésima entrada a partir da direita.
+    Entradas mais à esquerda podem ter sido forjadas pelo próprio cliente.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if TRUSTED_PROXY_HOPS <= 0:
+        return peer
+    forwarded = [ip.strip() for ip in request.headers.get("x-forwarded-for", "").split(",") if ip.strip()]
+    if len(forwarded) < TRUSTED_PROXY_HOPS:
+        return peer
+    return forwarded[-TRUSTED_PROXY_HOPS]
+
+def too_many_requests(retry_after: float) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Muitas tentativas. Tente novamente mais tarde.",
+        headers={"Retry-After": str(math.ceil(retry_after))},
+    )
+
+async def enforce_ip_rate_limit(client_ip: str):
+    """Limite global por IP, cobrado em toda chamada antes de qualquer hash de senha."""
+    retry_after = await auth_ip_limiter.acquire(client_ip)
+    if retry_after > 0:
+        raise too_many_requests(retry_after)
+
+def login_attempt_key(client_ip: str, email: str) -> str:
+    # Por (IP, email): terceiros não conseguem bloquear o login de uma conta
+    return f"{client_ip}|{email.lower()}"
+
+# Background jobs
+job_queue = jobs.JobQueue(JOB_QUEUE_WORKERS, JOB_MAX_RETRIES, JOB_RETRY_BASE_DELAY)
+
+# Passos executados em background depois de criar/atualizar um artigo.
+# Cada passo recebe o id do artigo (cache, busca, variantes de imagem, feeds...).
+post_publish_steps: Dict[str, Callable[[str], Awaitable]] = {}
+
+def post_publish_step(name: str):
+    def decorator(func: Callable[[str], Awaitable]):
+        post_publish_steps[name] = func
+        return func
+    return decorator
+
+def enqueue_post_publish(article_id: str):
+    for name, step in post_publish_steps.items():
+        job_queue.enqueue(f"{name}:{article_id}", step, article_id)
+
 # Auth endpoints
 @api_router.post("/auth/register", response_model=User)
-async def register(user_input: UserCreate):
+async def register(user_input: UserCreate, request: Request):
+    await enforce_ip_rate_limit(get_client_ip(request))
+
     existing = await db.users.find_one({"email": user_input.email})
     if existing:
         raise HTTPException(status_code=400, detail="Email já cadastrado")
@@ -154,13 +235,24 @@ async def register(user_input: UserCreate):
     return user
 
 @api_router.post("/auth/login")
-async def login(credentials: UserLogin):
+async def login(credentials: UserLogin, request: Request):
+    client_ip = get_client_ip(request)
+    await enforce_ip_rate_limit(client_ip)
+    # O token é reservado antes do hash, para que requisições concorrentes
+    # não passem todas pela checagem, e devolvido se a senha estiver certa
+    attempt_key = login_attempt_key(client_ip, credentials.email)
+    retry_after = await auth_email_limiter.acquire(attempt_key)
+    if retry_after > 0:
+        raise too_many_requests(retry_after)
+
     user_doc = await db.users.find_one({"email": credentials.email})
     if not user_doc:
         raise HTTPException(status_code=401, detail="Email ou senha incorretos")
     
     if not verify_password(credentials.senha, user_doc['password_hash']):
         raise HTTPException(status_code=401, detail="Email ou senha incorretos")
+
+    await auth_email_limiter.refund(attempt_key)
     
     access_token = create_access_token(data={"sub": user_doc['id']})
     user = User(**{k: v for k, v in user_doc.items() if k != 'password_hash'})
@@ -203,6 +295,7 @@ async def create_article(article_input: ArticleCreate, current_user: User = Depe
     )
     
     await db.articles.insert_one(article.model_dump())
+    enqueue_post_publish(article.id)
     return article
 
 @api_router.get("/articles", response_model=List[Article])
@@ -266,6 +359,7 @@ async def update_article(
     await db.articles.update_one({"id": article_id}, {"$set": update_data})
     
     updated_article = await db.articles.find_one({"id": article_id}, {"_id": 0})
+    enqueue_post_publish(article_id)
     return updated_article
 
 @api_router.delete("/articles/{article_id}")
@@ -307,6 +401,10 @@ async def get_stats(current_user: User = Depends(get_current_user)):
         "total_views": total_views[0]['total'] if total_views else 0
     }
 
+@api_router.get("/jobs/stats")
+async def get_job_stats(current_user: User = Depends(get_current_user)):
+    return job_queue.stats()
+
 # Include the router in the main app
 app.include_router(api_router)
 
@@ -327,6 +425,8 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("startup")
 async def startup_event():
+    job_queue.start()
+
     # Initialize categories if not exists
     count = await db.categories.count_documents({})
     if count == 0:
@@ -340,6 +440,11 @@ async def startup_event():
         await db.categories.insert_many(categories)
         logger.info("Categorias inicializadas")
 
+    if RATE_LIMIT_BACKEND == 'mongo':
+        for limiter in (auth_ip_limiter, auth_email_limiter):
+            await limiter.collection.create_index("expires_at", expireAfterSeconds=0)
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await job_queue.stop(JOB_SHUTDOWN_TIMEOUT)
     client.close()
\ No newline at end of file
@@ -0,0 +1,21 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# O backend roda a partir de backend/ (``uvicorn server:app``), então os
+# módulos são importados pelo nome, como o server.py faz.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+
+
+class FakeClock:
+    def __init__(self, start: float = 0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
@@ -0,0 +1,177 @@
+import asyncio
+import time
+
+import pytest
+
+from jobs import JobQueue
+
+
+def test_deduplicates_jobs_waiting_in_queue():
+    calls = []
+
+    async def job(article_id):
+        calls.append(article_id)
+
+    async def scenario():
+        queue = JobQueue(workers=2)
+        queue.start()
+        assert queue.enqueue("cache:1", job, "1")
+        assert not queue.enqueue("cache:1", job, "1")
+        assert queue.enqueue("cache:2", job, "2")
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(scenario())
+
+    assert sorted(calls) == ["1", "2"]
+    assert queue.metrics["deduplicated"] == 1
+
+
+def test_defers_job_for_running_key_instead_of_running_concurrently():
+    state = {"running": 0, "max_running": 0, "runs": 0}
+
+    async def job(article_id):
+        state["running"] += 1
+        state["max_running"] = max(state["max_running"], state["running"])
+        await asyncio.sleep(0.02)
+        state["running"] -= 1
+        state["runs"] += 1
+
+    async def scenario():
+        queue = JobQueue(workers=4)
+        queue.start()
+        queue.enqueue("index:1", job, "1")
+        await asyncio.sleep(0.005)
+        assert queue.enqueue("index:1", job, "1")
+        assert not queue.enqueue("index:1", job, "1")
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(scenario())
+
+    assert state == {"running": 0, "max_running": 1, "runs": 2}
+    assert queue.metrics["deferred"] == 1
+    assert queue.metrics["deduplicated"] == 1
+
+
+def test_retries_failing_job_up_to_max_retries():
+    attempts = []
+
+    async def job(article_id):
+        attempts.append(time.monotonic())
+        raise RuntimeError("boom")
+
+    async def scenario():
+        queue = JobQueue(workers=1, max_retries=2, retry_base_delay=0.02)
+        queue.start()
+        queue.enqueue("feed:1", job, "1")
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(scenario())
+
+    assert len(attempts) == 3
+    assert queue.metrics["retried"] == 2
+    assert queue.metrics["failed"] == 1
+    # Backoff exponencial entre as tentativas (com folga para o clock do loop)
+    assert attempts[1] - attempts[0] >= 0.02 * 0.9
+    assert attempts[2] - attempts[1] >= 0.04 * 0.9
+
+
+def test_retry_delay_is_exponential():
+    queue = JobQueue(retry_base_delay=1.5)
+
+    assert [queue.retry_delay(n) for n in (1, 2, 3)] == [1.5, 3.0, 6.0]
+
+
+def test_newer_job_supersedes_pending_retry():
+    calls = []
+
+    async def job(version):
+        calls.append(version)
+        if version == "old":
+            raise RuntimeError("boom")
+
+    async def scenario():
+        queue = JobQueue(workers=2, max_retries=3, retry_base_delay=0.05)
+        queue.start()
+        queue.enqueue("cache:1", job, "old")
+        await asyncio.sleep(0.01)
+        queue.enqueue("cache:1", job, "new")
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(scenario())
+
+    assert calls == ["old", "new"]
+    assert queue.metrics["superseded"] == 1
+
+
+def test_stop_drains_pending_retries():
+    calls = []
+
+    async def job(article_id):
+        calls.append(article_id)
+        if len(calls) == 1:
+            raise RuntimeError("boom")
+
+    async def scenario():
+        queue = JobQueue(workers=1, max_retries=1, retry_base_delay=0.02)
+        queue.start()
+        queue.enqueue("variants:1", job, "1")
+        await asyncio.sleep(0.005)
+        assert queue.stats()["retrying"] == 1
+        await queue.stop()
+        return queue
+
+    queue = asyncio.run(scenario())
+
+    assert calls == ["1", "1"]
+    assert queue.metrics["succeeded"] == 1
+    assert queue.stats()["depth"] == 0
+
+
+def test_enqueue_while_stopped_is_dropped():
+    async def job(article_id):
+        pass
+
+    async def scenario():
+        queue = JobQueue(workers=1)
+        assert not queue.enqueue("cache:1", job, "1")
+        queue.start()
+        assert queue.enqueue("cache:1", job, "1")
+        await queue.stop()
+        assert not queue.enqueue("cache:1", job, "1")
+        return queue
+
+    queue = asyncio.run(scenario())
+
+    assert queue.metrics["succeeded"] == 1
+    assert queue.metrics["deduplicated"] == 0
+
+
+def test_stats_averages_wait_and_run_time(clock):
+
+    async def job(article_id):
+        clock.now += 2
+
+    async def scenario():
+        queue = JobQueue(workers=1, clock=clock)
+        queue.start()
+        queue.enqueue("cache:1", job, "1")
+        queue.enqueue("cache:2", job, "2")
+        await queue.stop()
+        return queue.stats()
+
+    stats = asyncio.run(scenario())
+
+    assert stats["succeeded"] == 2
+    assert stats["avg_wait_seconds"] == pytest.approx(1)
+    assert stats["avg_run_seconds"] == pytest.approx(2)
+
+
+def test_rejects_invalid_config():
+    with pytest.raises(ValueError):
+        JobQueue(workers=0)
+    with pytest.raises(ValueError):
+        JobQueue(max_retries=-1)
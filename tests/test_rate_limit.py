@@ -0,0 +1,161 @@
+import asyncio
+
+import pytest
+from pymongo import ReturnDocument
+
+from rate_limit import MongoTokenBucketLimiter, TokenBucketLimiter, create_limiter
+
+
+def test_denies_after_capacity_with_retry_after(clock):
+    limiter = TokenBucketLimiter(capacity=5, refill_per_sec=0.05, clock=clock)
+
+    for _ in range(5):
+        assert asyncio.run(limiter.acquire("a")) == 0
+    retry_after = asyncio.run(limiter.acquire("a"))
+
+    assert retry_after == pytest.approx(20)
+
+
+def test_refills_after_time_passes(clock):
+    limiter = TokenBucketLimiter(capacity=2, refill_per_sec=0.5, clock=clock)
+    asyncio.run(limiter.acquire("a"))
+    asyncio.run(limiter.acquire("a"))
+    assert asyncio.run(limiter.acquire("a")) > 0
+
+    clock.now += 2
+    assert asyncio.run(limiter.acquire("a")) == 0
+    assert asyncio.run(limiter.acquire("a")) > 0
+
+
+def test_refill_is_capped_at_capacity(clock):
+    limiter = TokenBucketLimiter(capacity=2, refill_per_sec=1, clock=clock)
+    asyncio.run(limiter.acquire("a"))
+
+    clock.now += 3600
+    assert asyncio.run(limiter.acquire("a")) == 0
+    assert asyncio.run(limiter.acquire("a")) == 0
+    assert asyncio.run(limiter.acquire("a")) > 0
+
+
+def test_refund_returns_consumed_token(clock):
+    limiter = TokenBucketLimiter(capacity=2, refill_per_sec=0.05, clock=clock)
+
+    for _ in range(10):
+        assert asyncio.run(limiter.acquire("a")) == 0
+        asyncio.run(limiter.refund("a"))
+    asyncio.run(limiter.acquire("a"))
+    asyncio.run(limiter.acquire("a"))
+    assert asyncio.run(limiter.acquire("a")) > 0
+
+
+def test_refund_is_capped_at_capacity(clock):
+    limiter = TokenBucketLimiter(capacity=1, refill_per_sec=0.05, clock=clock)
+    asyncio.run(limiter.acquire("a"))
+    asyncio.run(limiter.refund("a"))
+    asyncio.run(limiter.refund("a"))
+
+    assert asyncio.run(limiter.acquire("a")) == 0
+    assert asyncio.run(limiter.acquire("a")) > 0
+
+
+def test_evicts_least_recently_used_key(clock):
+    limiter = TokenBucketLimiter(capacity=5, refill_per_sec=1, max_keys=3, clock=clock)
+    for key in ("a", "b", "c"):
+        asyncio.run(limiter.acquire(key))
+    asyncio.run(limiter.acquire("a"))
+    asyncio.run(limiter.acquire("d"))
+
+    assert len(limiter) == 3
+    assert "b" not in limiter
+    assert all(key in limiter for key in ("a", "c", "d"))
+
+
+@pytest.mark.parametrize("capacity, refill_per_sec", [(5, 0), (5, -1), (0, 1)])
+def test_rejects_invalid_bucket_config(capacity, refill_per_sec):
+    with pytest.raises(ValueError):
+        TokenBucketLimiter(capacity, refill_per_sec)
+    with pytest.raises(ValueError):
+        MongoTokenBucketLimiter(None, capacity, refill_per_sec)
+
+
+def test_create_limiter_rejects_unknown_backend():
+    with pytest.raises(ValueError):
+        create_limiter("redis", 5, 1)
+    assert isinstance(create_limiter("memory", 5, 1), TokenBucketLimiter)
+
+
+def evaluate(expr, doc):
+    """Avalia o subconjunto de expressões de agregação usado pelo limiter."""
+    if isinstance(expr, str) and expr.startswith("$"):
+        return doc.get(expr[1:])
+    if not isinstance(expr, dict):
+        return expr
+    (op, args), = expr.items()
+    values = [evaluate(arg, doc) for arg in args]
+    if op == "$ifNull":
+        return values[1] if values[0] is None else values[0]
+    if op == "$min":
+        return min(values)
+    if op == "$add":
+        return sum(values)
+    if op == "$subtract":
+        return values[0] - values[1]
+    if op == "$multiply":
+        return values[0] * values[1]
+    if op == "$gte":
+        return values[0] >= values[1]
+    if op == "$cond":
+        return values[1] if values[0] else values[2]
+    raise NotImplementedError(op)
+
+
+class FakeCollection:
+    def __init__(self):
+        self.docs = {}
+
+    def _apply(self, doc, pipeline):
+        for stage in pipeline:
+            (op, fields), = stage.items()
+            assert op == "$set"
+            doc = {**doc, **{name: evaluate(value, doc) for name, value in fields.items()}}
+        return doc
+
+    async def find_one_and_update(self, query, pipeline, upsert=False, return_document=ReturnDocument.BEFORE):
+        assert upsert and return_document is ReturnDocument.AFTER
+        key = query["_id"]
+        self.docs[key] = self._apply(self.docs.get(key, {"_id": key}), pipeline)
+        return dict(self.docs[key])
+
+    async def update_one(self, query, pipeline):
+        key = query["_id"]
+        if key in self.docs:
+            self.docs[key] = self._apply(self.docs[key], pipeline)
+
+
+def test_mongo_limiter_pipeline_denies_and_refills(clock):
+    collection = FakeCollection()
+    limiter = MongoTokenBucketLimiter(collection, capacity=2, refill_per_sec=0.5, clock=clock)
+
+    assert asyncio.run(limiter.acquire("a")) == 0
+    assert asyncio.run(limiter.acquire("a")) == 0
+    assert asyncio.run(limiter.acquire("a")) == pytest.approx(2)
+    assert collection.docs["a"]["allowed"] is False
+    assert collection.docs["a"]["tokens"] == pytest.approx(0)
+
+    clock.now += 2
+    assert asyncio.run(limiter.acquire("a")) == 0
+    assert collection.docs["a"]["tokens"] == pytest.approx(0)
+    assert collection.docs["a"]["expires_at"] is not None
+
+
+def test_mongo_limiter_refund(clock):
+    collection = FakeCollection()
+    limiter = MongoTokenBucketLimiter(collection, capacity=1, refill_per_sec=0.05, clock=clock)
+
+    asyncio.run(limiter.acquire("a"))
+    asyncio.run(limiter.refund("a"))
+    asyncio.run(limiter.refund("a"))
+
+    assert collection.docs["a"]["tokens"] == 1
+    assert asyncio.run(limiter.acquire("a")) == 0
+    assert asyncio.run(limiter.acquire("a")) > 0
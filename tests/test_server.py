@@ -0,0 +1,243 @@
+import asyncio
+import time
+from unittest.mock import Mock
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+import server
+from jobs import JobQueue
+from rate_limit import TokenBucketLimiter
+
+
+class FakeCollection:
+    """Coleção em memória com o subconjunto da API do motor usado pelo server."""
+
+    def __init__(self, docs=None):
+        self.docs = list(docs or [])
+
+    def _match(self, query):
+        for doc in self.docs:
+            if all(doc.get(k) == v for k, v in query.items()):
+                return doc
+        return None
+
+    async def find_one(self, query, projection=None):
+        doc = self._match(query)
+        return dict(doc) if doc else None
+
+    async def insert_one(self, doc):
+        self.docs.append(dict(doc))
+
+    async def update_one(self, query, update):
+        doc = self._match(query)
+        if doc:
+            doc.update(update.get("$set", {}))
+            for k, v in update.get("$inc", {}).items():
+                doc[k] = doc.get(k, 0) + v
+
+    async def count_documents(self, query):
+        return len(self.docs)
+
+
+class FakeDb:
+    def __init__(self, **collections):
+        self.users = collections.get("users", FakeCollection())
+        self.articles = collections.get("articles", FakeCollection())
+        self.categories = collections.get("categories", FakeCollection())
+
+
+USER = {
+    "id": "user-1",
+    "email": "editor@example.com",
+    "nome": "Editor",
+    "created_at": "2026-01-01T00:00:00+00:00",
+    "password_hash": "hash",
+}
+
+
+def make_request(peer="10.0.0.1", forwarded=None):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded is not None else []
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+@pytest.fixture
+def app_client(monkeypatch, clock):
+    monkeypatch.setattr(server, "db", FakeDb(users=FakeCollection([USER])))
+    monkeypatch.setattr(server, "auth_ip_limiter", TokenBucketLimiter(20, 0.2, clock=clock))
+    monkeypatch.setattr(server, "auth_email_limiter", TokenBucketLimiter(1, 0.05, clock=clock))
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 1)
+    return TestClient(server.app)
+
+
+def login(client, senha="errada", ip="1.1.1.1"):
+    return client.post(
+        "/api/auth/login",
+        json={"email": USER["email"], "senha": senha},
+        headers={"X-Forwarded-For": ip},
+    )
+
+
+def test_client_ip_ignores_header_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 0)
+
+    assert server.get_client_ip(make_request(forwarded="1.1.1.1")) == "10.0.0.1"
+
+
+@pytest.mark.parametrize("hops, expected", [(1, "3.3.3.3"), (2, "2.2.2.2"), (3, "1.1.1.1")])
+def test_client_ip_counts_trusted_hops_from_the_right(monkeypatch, hops, expected):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", hops)
+
+    assert server.get_client_ip(make_request(forwarded="1.1.1.1, 2.2.2.2,3.3.3.3")) == expected
+
+
+def test_client_ip_falls_back_to_peer_with_too_few_entries(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 2)
+
+    assert server.get_client_ip(make_request(forwarded="1.1.1.1")) == "10.0.0.1"
+    assert server.get_client_ip(make_request()) == "10.0.0.1"
+
+
+def test_client_ip_ignores_blank_entries(monkeypatch):
+    monkeypatch.setattr(server, "TRUSTED_PROXY_HOPS", 2)
+
+    assert server.get_client_ip(make_request(forwarded="1.1.1.1, ,2.2.2.2,  ")) == "1.1.1.1"
+
+
+def test_throttled_login_returns_429_before_password_check(app_client, monkeypatch):
+    verify = Mock(return_value=False)
+    monkeypatch.setattr(server, "verify_password", verify)
+
+    assert login(app_client).status_code == 401
+    response = login(app_client)
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "20"
+    assert verify.call_count == 1
+
+
+def test_successful_login_does_not_consume_attempts(app_client, monkeypatch):
+    monkeypatch.setattr(server, "verify_password", Mock(return_value=True))
+
+    for _ in range(3):
+        assert login(app_client, senha="certa").status_code == 200
+
+
+def test_failed_logins_from_another_ip_do_not_lock_the_account(app_client, monkeypatch):
+    monkeypatch.setattr(server, "verify_password", Mock(return_value=False))
+    login(app_client, ip="6.6.6.6")
+    assert login(app_client, ip="6.6.6.6").status_code == 429
+
+    assert login(app_client, ip="1.1.1.1").status_code == 401
+
+
+def test_throttled_register_returns_429_before_hashing(app_client, monkeypatch, clock):
+    hash_password = Mock(return_value="hash")
+    monkeypatch.setattr(server, "hash_password", hash_password)
+    monkeypatch.setattr(server, "auth_ip_limiter", TokenBucketLimiter(1, 0.2, clock=clock))
+
+    def register(email):
+        return app_client.post(
+            "/api/auth/register",
+            json={"email": email, "senha": "segredo", "nome": "Novo"},
+            headers={"X-Forwarded-For": "1.1.1.1"},
+        )
+
+    assert register("a@example.com").status_code == 200
+    response = register("b@example.com")
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "5"
+    assert hash_password.call_count == 1
+
+
+CATEGORY = {"id": "cat-1", "nome": "Tecnologia", "slug": "tecnologia"}
+
+ARTICLE = {
+    "id": "art-1",
+    "titulo": "Título",
+    "slug": "titulo",
+    "resumo": "Resumo",
+    "conteudo": "Conteúdo",
+    "imagem_url": "https://example.com/a.jpg",
+    "categoria_id": "cat-1",
+    "categoria_nome": "Tecnologia",
+    "autor_id": "user-1",
+    "autor_nome": "Editor",
+    "data_publicacao": "2026-01-01T00:00:00+00:00",
+    "ultima_atualizacao": "2026-01-01T00:00:00+00:00",
+    "destaque": False,
+    "visualizacoes": 0,
+}
+
+SLOW_STEP_SECONDS = 0.5
+
+
+@pytest.fixture
+def publish_client(monkeypatch):
+    """Cliente com a fila de jobs rodando e um passo pós-publicação lento."""
+    monkeypatch.setattr(server, "db", FakeDb(
+        articles=FakeCollection([ARTICLE]),
+        categories=FakeCollection([CATEGORY]),
+    ))
+    queue = JobQueue(workers=2, max_retries=0)
+    monkeypatch.setattr(server, "job_queue", queue)
+    monkeypatch.setattr(server, "post_publish_steps", {})
+    keys, done = [], []
+    enqueue = queue.enqueue
+
+    def recording_enqueue(key, func, *args):
+        keys.append(key)
+        return enqueue(key, func, *args)
+
+    monkeypatch.setattr(queue, "enqueue", recording_enqueue)
+
+    @server.post_publish_step("warm-cache")
+    async def warm_cache(article_id):
+        await asyncio.sleep(SLOW_STEP_SECONDS)
+        done.append(article_id)
+
+    user = server.User(**{k: v for k, v in USER.items() if k != "password_hash"})
+    server.app.dependency_overrides[server.get_current_user] = lambda: user
+    # Sem entrar no contexto: cada teste controla startup/shutdown com ``with``
+    yield TestClient(server.app), keys, done
+    server.app.dependency_overrides.clear()
+
+
+def test_create_article_enqueues_post_publish_steps_without_waiting(publish_client):
+    client, keys, done = publish_client
+
+    with client:
+        started = time.monotonic()
+        response = client.post("/api/articles", json={
+            "titulo": "Novo artigo",
+            "resumo": "Resumo",
+            "conteudo": "Conteúdo",
+            "imagem_url": "https://example.com/b.jpg",
+            "categoria_id": "cat-1",
+        })
+        elapsed = time.monotonic() - started
+        assert done == []
+
+    assert response.status_code == 200
+    article_id = response.json()["id"]
+    assert keys == [f"warm-cache:{article_id}"]
+    assert elapsed < SLOW_STEP_SECONDS
+    # O shutdown espera a fila esvaziar
+    assert done == [article_id]
+
+
+def test_update_article_is_not_slowed_by_post_publish_steps(publish_client):
+    client, keys, done = publish_client
+
+    with client:
+        started = time.monotonic()
+        response = client.put("/api/articles/art-1", json={"destaque": True})
+        elapsed = time.monotonic() - started
+        assert done == []
+
+    assert response.status_code == 200
+    assert keys == ["warm-cache:art-1"]
+    assert elapsed < SLOW_STEP_SECONDS
+    assert done == ["art-1"]